@@ -24,11 +24,13 @@ setuptools.setup(
     package_data={"ska_sdp_lmc": ["schema/*.json"]},
     install_requires=[
         "pytango",
+        "schema",
         "ska-sdp-config",
         "ska-ser-log-transactions",
         "ska-tango-base",
         "ska-telescope-model",
     ],
+    extras_require={"orjson": ["orjson"]},
     entry_points={
         "console_scripts": [
             "SDPMaster = ska_sdp_lmc.master:main",
@@ -37,6 +39,7 @@ setuptools.setup(
     },
     setup_requires=["pytest-runner"],
     tests_require=[
+        "orjson",
         "pytest",
         "pytest-bdd",
         "pytest-cov",
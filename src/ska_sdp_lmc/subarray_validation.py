@@ -2,9 +2,9 @@
 
 import json
 
-import ska_sdp_config
-
-from ska_telmodel.schema import validate
+from schema import SchemaError
+from ska_sdp_config import ProcessingBlock
+from ska_telmodel.schema import schema_by_uri
 from ska_telmodel.sdp.version import (
     SDP_ASSIGNRES_PREFIX,
     SDP_CONFIGURE_PREFIX,
@@ -14,6 +14,15 @@ from ska_telmodel.sdp.version import (
 from .exceptions import raise_command_failed
 from .tango_logging import get_logger
 
+# Use orjson to decode configuration strings if it is available (install the
+# "orjson" extra). Its decode error is a subclass of json.JSONDecodeError, so
+# error handling is the same. Unlike the json module, it rejects NaN and
+# Infinity, and decodes integers wider than 64 bits as floats.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 LOG = get_logger()
 
 MSG_VALIDATION_FAILED = "Configuration validation failed"
@@ -23,6 +32,23 @@ SCHEMA_VERSION_0_3 = "0.3"
 SCHEMA_VERSION_DEFAULT = SCHEMA_VERSION_0_2
 SCHEMA_VERSION_ALLOWED = (SCHEMA_VERSION_0_2, SCHEMA_VERSION_0_3)
 
+# Schemas keyed by interface URI, resolved on first use. Schemas are
+# versioned, so the entries never need to be invalidated.
+_SCHEMA_CACHE = {}
+
+# Key renames to convert configurations to the form used in the config DB.
+# The keys are required unless listed in _OPTIONAL_KEYS. Keys that have the
+# same name in the config DB are included so their presence is checked.
+_EB_KEYS_V02 = {"id": "eb_id"}
+_SCAN_TYPE_KEYS_V02 = {"id": "id", "coordinate_system": "reference_frame"}
+_SCAN_TYPE_KEYS_V03 = {"scan_type_id": "id"}
+_PB_KEYS_V02 = {"id": "pb_id"}
+_WORKFLOW_KEYS_V02 = {"type": "type", "id": "id"}
+_WORKFLOW_KEYS_V03 = {"kind": "type", "name": "id"}
+_DEPENDENCY_KEYS_V02 = {"type": "kind"}
+_SCAN_KEYS_V02 = {"id": "scan_id"}
+_OPTIONAL_KEYS = frozenset({"coordinate_system"})
+
 
 def validate_assign_resources(config_str):
     """
@@ -43,24 +69,11 @@ def validate_assign_resources(config_str):
         # Validation has failed, so raise an error
         raise_command_failed(MSG_VALIDATION_FAILED, __name__)
 
+    # Convert keys to the form used in the config DB
     if version == SCHEMA_VERSION_0_2:
-        # Convert keys to version 0.3
-        config["eb_id"] = config.pop("id")
-
-        for scan_type in config.get("scan_types"):
-            scan_type["scan_type_id"] = scan_type.pop("id")
-            if "coordinate_system" in scan_type:
-                scan_type["reference_frame"] = scan_type.pop("coordinate_system")
-
-        for pbc in config.get("processing_blocks"):
-            pbc["pb_id"] = pbc.pop("id")
-            workflow = pbc.get("workflow")
-            workflow["kind"] = workflow.pop("type")
-            workflow["name"] = workflow.pop("id")
-            if "dependencies" in pbc:
-                dependencies = pbc.get("dependencies")
-                for dependency in dependencies:
-                    dependency["kind"] = dependency.pop("type")
+        config = _convert_assign_resources_v02(config)
+    else:
+        config = _convert_assign_resources_v03(config)
 
     # Parse the configuration to get the SBI and PBs
     sbi, pbs = _parse_sbi_and_pbs(config)
@@ -68,11 +81,65 @@ def validate_assign_resources(config_str):
     return sbi, pbs
 
 
+def _convert_assign_resources_v02(config):
+    """
+    Convert version 0.2 AssignResources keys to the form used in the config DB.
+
+    :param config: configuration data
+    :returns: converted configuration data
+
+    """
+    config = _rename_keys(config, _EB_KEYS_V02)
+    config["scan_types"] = [
+        _rename_keys(scan_type, _SCAN_TYPE_KEYS_V02)
+        for scan_type in config.get("scan_types")
+    ]
+
+    pbcs = []
+    for pbc in config.get("processing_blocks"):
+        pbc = _rename_keys(pbc, _PB_KEYS_V02)
+        pbc["workflow"] = _rename_keys(pbc.get("workflow"), _WORKFLOW_KEYS_V02)
+        if "dependencies" in pbc:
+            pbc["dependencies"] = [
+                _rename_keys(dependency, _DEPENDENCY_KEYS_V02)
+                for dependency in pbc.get("dependencies")
+            ]
+        pbcs.append(pbc)
+    config["processing_blocks"] = pbcs
+
+    return config
+
+
+def _convert_assign_resources_v03(config):
+    """
+    Convert version 0.3 AssignResources keys to the form used in the config DB.
+
+    :param config: configuration data
+    :returns: converted configuration data
+
+    """
+    config = dict(config)
+    config["scan_types"] = [
+        _rename_keys(scan_type, _SCAN_TYPE_KEYS_V03)
+        for scan_type in config.get("scan_types")
+    ]
+
+    # Temporary - config DB currently doesn't support new schema
+    pbcs = []
+    for pbc in config.get("processing_blocks"):
+        pbc = dict(pbc)
+        pbc["workflow"] = _rename_keys(pbc.get("workflow"), _WORKFLOW_KEYS_V03)
+        pbcs.append(pbc)
+    config["processing_blocks"] = pbcs
+
+    return config
+
+
 def _parse_sbi_and_pbs(config):
     """
     Parse the configuration to get the SBI and PBs.
 
-    :param config: configuration data
+    :param config: configuration data with keys converted to config DB form
     :returns: SBI and list of PBs
 
     """
@@ -80,15 +147,10 @@ def _parse_sbi_and_pbs(config):
 
     eb_id = config.get("eb_id")
 
-    # Convert "scan_type_id" to "id"
-    scan_types = config.get("scan_types")
-    for scan_type in scan_types:
-        scan_type["id"] = scan_type.pop("scan_type_id")
-
     sbi = {
         "id": eb_id,
         "subarray_id": None,
-        "scan_types": scan_types,
+        "scan_types": config.get("scan_types"),
         "pb_realtime": [],
         "pb_batch": [],
         "pb_receive_addresses": None,
@@ -97,36 +159,36 @@ def _parse_sbi_and_pbs(config):
         "status": "ACTIVE",
     }
 
-    # Loop over the processing block configurations
+    # Lists of processing block IDs indexed by workflow type
+    pb_lists = {"realtime": sbi["pb_realtime"], "batch": sbi["pb_batch"]}
+
+    # Loop over the processing block configurations. The logger is bound to a
+    # local name as it is used on every iteration.
+    log = LOG
     pbs = []
 
     for pbc in config.get("processing_blocks"):
 
         pb_id = pbc.get("pb_id")
-        LOG.info("Parsing processing block %s", pb_id)
+        log.info("Parsing processing block %s", pb_id)
 
         # Get type of workflow and add the processing block ID to the
         # appropriate list.
         workflow = pbc.get("workflow")
 
-        # Temporary - config DB currently doesn't support new schema
-        workflow["type"] = workflow.pop("kind")
-        workflow["id"] = workflow.pop("name")
-
         wf_type = workflow.get("type")
-        if wf_type == "realtime":
-            sbi["pb_realtime"].append(pb_id)
-        elif wf_type == "batch":
-            sbi["pb_batch"].append(pb_id)
+        pb_list = pb_lists.get(wf_type)
+        if pb_list is None:
+            log.error("Unknown workflow type: %s", wf_type)
         else:
-            LOG.error("Unknown workflow type: %s", wf_type)
+            pb_list.append(pb_id)
 
         parameters = pbc.get("parameters")
 
         dependencies = []
         if "dependencies" in pbc:
             if wf_type == "realtime":
-                LOG.error(
+                log.error(
                     "dependencies attribute must not appear in "
                     "real-time processing block configuration"
                 )
@@ -135,7 +197,7 @@ def _parse_sbi_and_pbs(config):
 
         # Add processing block to list
         pbs.append(
-            ska_sdp_config.ProcessingBlock(
+            ProcessingBlock(
                 pb_id,
                 eb_id,
                 workflow,
@@ -167,26 +229,71 @@ def validate_configure(config_str):
         # Validation has failed, so raise an error
         raise_command_failed(MSG_VALIDATION_FAILED, __name__)
 
+    # Convert keys to the form used in the config DB
     if version == SCHEMA_VERSION_0_2:
-        # Convert the keys to version 0.3.
-        new_scan_types = config.get("new_scan_types")
-        if new_scan_types is not None:
-            for new_scan_type in new_scan_types:
-                new_scan_type["scan_type_id"] = new_scan_type.pop("id")
-                if "coordinate_system" in new_scan_type:
-                    new_scan_type["reference_frame"] = new_scan_type.pop(
-                        "coordinate_system"
-                    )
+        config = _convert_configure_v02(config)
+    else:
+        config = _convert_configure_v03(config)
 
     new_scan_types = config.get("new_scan_types")
     scan_type = config.get("scan_type")
 
-    # Convert "scan_type_id" to "id"
+    return new_scan_types, scan_type
+
+
+def _convert_configure_v02(config):
+    """
+    Convert version 0.2 Configure keys to the form used in the config DB.
+
+    :param config: configuration data
+    :returns: converted configuration data
+
+    """
+    config = dict(config)
+    new_scan_types = config.get("new_scan_types")
     if new_scan_types is not None:
-        for new_scan_type in new_scan_types:
-            new_scan_type["id"] = new_scan_type.pop("scan_type_id")
+        config["new_scan_types"] = [
+            _rename_keys(new_scan_type, _SCAN_TYPE_KEYS_V02)
+            for new_scan_type in new_scan_types
+        ]
+    return config
 
-    return new_scan_types, scan_type
+
+def _convert_configure_v03(config):
+    """
+    Convert version 0.3 Configure keys to the form used in the config DB.
+
+    :param config: configuration data
+    :returns: converted configuration data
+
+    """
+    config = dict(config)
+    new_scan_types = config.get("new_scan_types")
+    if new_scan_types is not None:
+        config["new_scan_types"] = [
+            _rename_keys(new_scan_type, _SCAN_TYPE_KEYS_V03)
+            for new_scan_type in new_scan_types
+        ]
+    return config
+
+
+def _rename_keys(data, mapping):
+    """
+    Rename keys in a dictionary.
+
+    This builds the renamed dictionary in a single pass, rather than popping
+    and reassigning each key.
+
+    :param data: dictionary
+    :param mapping: new key names indexed by old key name
+    :returns: new dictionary with renamed keys
+    :raises KeyError: if a required key in the mapping is missing
+
+    """
+    for key in mapping:
+        if key not in data and key not in _OPTIONAL_KEYS:
+            raise KeyError(key)
+    return {mapping.get(key, key): value for key, value in data.items()}
 
 
 def validate_scan(config_str):
@@ -209,15 +316,26 @@ def validate_scan(config_str):
         # Validation has failed, so raise an error
         raise_command_failed(MSG_VALIDATION_FAILED, __name__)
 
+    # Convert keys to the form used in the config DB
     if version == SCHEMA_VERSION_0_2:
-        # Convert to version 0.3
-        config["scan_id"] = config.pop("id")
+        config = _convert_scan_v02(config)
 
     scan_id = config.get("scan_id")
 
     return scan_id
 
 
+def _convert_scan_v02(config):
+    """
+    Convert version 0.2 Scan keys to the form used in the config DB.
+
+    :param config: configuration data
+    :returns: converted configuration data
+
+    """
+    return _rename_keys(config, _SCAN_KEYS_V02)
+
+
 def validate_json_config(config_str, prefix, default, allowed):
     """
     Validate a JSON configuration string against a schema.
@@ -231,17 +349,18 @@ def validate_json_config(config_str, prefix, default, allowed):
 
     """
     try:
-        config = json.loads(config_str)
+        config = json_loads(config_str)
         if "interface" in config:
             schema = config.get("interface")
         else:
             schema = prefix + default
         version = check_sdp_interface_version(schema, prefix)
-        validate(schema, config, 1)
+        if version in allowed:
+            _get_schema(prefix + version).validate(config)
     except json.JSONDecodeError as error:
         LOG.error("Unable to decode configuration string as JSON: %s", error.msg)
         version, config = None, None
-    except ValueError as error:
+    except (ValueError, SchemaError) as error:
         LOG.error("Unable to validate JSON configuration: %s", str(error))
         version, config = None, None
 
@@ -253,3 +372,18 @@ def validate_json_config(config_str, prefix, default, allowed):
         LOG.debug("Successfully validated JSON configuration")
 
     return version, config
+
+
+def _get_schema(uri):
+    """
+    Get the schema for an interface URI, resolving it if it is not cached.
+
+    :param uri: interface URI
+    :returns: schema
+
+    """
+    schema = _SCHEMA_CACHE.get(uri)
+    if schema is None:
+        schema = schema_by_uri(uri, 1)
+        _SCHEMA_CACHE[uri] = schema
+    return schema
@@ -1,8 +1,7 @@
 """Standard logging for TANGO devices."""
 
-import inspect
 import logging
-import pathlib
+import os
 import sys
 import threading
 from typing import Any, Callable, Iterable
@@ -26,6 +25,11 @@ _TANGO_TO_PYTHON = {
     tango.LogLevel.LOG_OFF: logging.NOTSET,
 }
 _PYTHON_TO_TANGO = {v: k for k, v in _TANGO_TO_PYTHON.items()}
+# Path of this module as it appears in log records, which is the filename of
+# the code object rather than __file__.
+_THIS_FILE = sys._getframe().f_code.co_filename  # pylint: disable=protected-access
+# The "stacklevel" keyword to logging calls is only available from Python 3.8
+_HAS_STACKLEVEL = sys.version_info >= (3, 8)
 
 
 def to_python_level(tango_level: tango.LogLevel) -> int:
@@ -57,15 +61,16 @@ def to_tango_level(python_level: int) -> tango.LogLevel:
 class LogManager:
     """Redirect log messages.
 
-    This is redundant from Python 3.8 as the logging module then supports
-    a "stacklevel" keyword.
+    From Python 3.8 the logging module's "stacklevel" keyword is used, and
+    the frame capture here is only needed for older versions.
     """
 
     # pylint: disable=too-few-public-methods
 
     def __init__(self):
         """Initialise the constructor."""
-        self.frames = {}
+        # Caller location of the last redirected message in each thread
+        self.frames = threading.local()
 
     def make_fn(self, level: int) -> Callable:
         """Create a redirection function.
@@ -73,12 +78,26 @@ class LogManager:
         :param level: to log. default: INFO
         :returns: logging function to call
         """
+        if _HAS_STACKLEVEL:
+            # Let the logging module attribute the record to our caller. This
+            # calls the root logger's method rather than the module-level
+            # function, as before Python 3.11 the extra frame of the latter
+            # is counted in the stack level.
+            root = logging.getLogger()
+            return lambda _, msg, *args: root.log(level, msg, *args, stacklevel=2)
         return lambda _, msg, *args: self._log_it(level, msg, *args)
 
     def _log_it(self, level: int, msg: str, *args) -> None:
         # There are two levels of indirection.
-        # Remember the right frame in a thread-safe way.
-        self.frames[threading.current_thread()] = inspect.stack()[2]
+        # Remember the right frame info in a thread-safe way. Only the
+        # location is kept, not the frame, so no references are held.
+        frame = sys._getframe(2)  # pylint: disable=protected-access
+        code = frame.f_code
+        self.frames.frame = (
+            code.co_filename,
+            code.co_name,
+            frame.f_lineno,
+        )
         logging.log(level, msg, *args)
 
 
@@ -92,6 +111,8 @@ class TangoFilter(logging.Filter):
     # pylint: disable=too-few-public-methods
 
     device_name = ""
+    # Tags for the device, set when the device name is configured
+    tags_prefix = "tango-device:"
     # Use a context variable to store the transaction ID
     transaction_id = contextvars.ContextVar("transaction_id", default="")
     log_man = LogManager()
@@ -103,11 +124,11 @@ class TangoFilter(logging.Filter):
         :param record: log record
         :return: true if record should be logged (always)
         """
-        tags = "tango-device:" + TangoFilter.device_name
         transaction_id = TangoFilter.transaction_id.get()
         if transaction_id:
-            tags += "," + transaction_id
-        record.tags = tags
+            record.tags = TangoFilter.tags_prefix + "," + transaction_id
+        else:
+            record.tags = TangoFilter.tags_prefix
 
         level = record.levelno
         if level not in _PYTHON_TO_TANGO:
@@ -115,15 +136,15 @@ class TangoFilter(logging.Filter):
 
         # If the record originates from this module, insert the
         # right frame info.
-        if record.pathname == __file__:
-            thread = threading.current_thread()
-            # The thread should be in the dictionary, but may not be if the
-            # module has been reloaded e.g. by unit test.
-            if thread in TangoFilter.log_man.frames:
-                frame = TangoFilter.log_man.frames[thread]
-                record.funcName = frame.function
-                record.filename = pathlib.Path(frame.filename).name
-                record.lineno = frame.lineno
+        if record.pathname == _THIS_FILE:
+            # The frame info should be set for this thread, but may not be
+            # if the module has been reloaded e.g. by unit test.
+            frame = getattr(TangoFilter.log_man.frames, "frame", None)
+            if frame is not None:
+                filename, func_name, lineno = frame
+                record.funcName = func_name
+                record.filename = os.path.basename(filename)
+                record.lineno = lineno
         return True
 
 
@@ -191,6 +212,7 @@ def configure(
 
     # Monkey patch the tango device logging to redirect to python.
     TangoFilter.device_name = device_name
+    TangoFilter.tags_prefix = "tango-device:" + device_name
     device_class.debug_stream = TangoFilter.log_man.make_fn(logging.DEBUG)
     device_class.info_stream = TangoFilter.log_man.make_fn(logging.INFO)
     device_class.warn_stream = TangoFilter.log_man.make_fn(logging.WARNING)
@@ -1,14 +1,20 @@
 """Utilities."""
 import copy
-import inspect
 import logging
-import pathlib
+import os
+import re
 import sys
 from typing import List, Type, Optional
 
 from .tango_logging import get_logger
 
 LOG = get_logger()
+# Path of this module as it appears in log records and frames
+_THIS_FILE = sys._getframe().f_code.co_filename  # pylint: disable=protected-access
+# Maximum number of frames to walk when looking for the caller
+_MAX_FRAMES = 20
+# Search for the parts of a filename that identify the caller
+_MATCH_CALLER = re.compile(r"lmc|tests").search
 
 # This is to find the stack info of the caller, not the one in this module.
 # For some reason the device subclass is not always in the stack when run from
@@ -22,24 +28,30 @@ class _CallerFilter(logging.Filter):
         self.match = match
 
     def filter(self, record: logging.LogRecord) -> bool:
-        if record.pathname == __file__:
-            frames = inspect.stack()
-            frame = None
-            for frame in frames:
-                if self.ignore(frame):
-                    continue
-                if self.match(frame):
+        if record.pathname == _THIS_FILE:
+            # Walk out from this frame. The predicates are applied to the
+            # filename of each frame. The walk is bounded in case nothing
+            # matches.
+            frame = sys._getframe()  # pylint: disable=protected-access
+            caller = frame
+            depth = 0
+            while frame is not None and depth < _MAX_FRAMES:
+                caller = frame
+                filename = frame.f_code.co_filename
+                if not self.ignore(filename) and self.match(filename):
                     break
-            record.funcName = frame.function
-            record.filename = pathlib.Path(frame.filename).name
-            record.lineno = frame.lineno
+                frame = frame.f_back
+                depth += 1
+            record.funcName = caller.f_code.co_name
+            record.filename = os.path.basename(caller.f_code.co_filename)
+            record.lineno = caller.f_lineno
         return True
 
 
 LOG.addFilter(
     _CallerFilter(
-        ignore=lambda f: f.filename == __file__,
-        match=lambda f: any(text in f.filename for text in ("lmc", "tests")),
+        ignore=lambda filename: filename == _THIS_FILE,
+        match=lambda filename: _MATCH_CALLER(filename) is not None,
     )
 )
 
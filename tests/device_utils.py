@@ -1,22 +1,28 @@
 """Utilities for device tests."""
 
+import functools
 import time
 from typing import Callable
 
 import tango
 
-from ska_sdp_lmc import tango_logging, base
+from ska_sdp_lmc import tango_logging, base, base_config
 from . import test_logging
 
 LOG_LIST = test_logging.ListHandler()
 LOG = tango_logging.get_logger()
 SLEEP = 0.05
 TIMEOUT = 5.0
+# Initial polling interval, doubled up to the sleep time on each iteration
+MIN_SLEEP = 0.001
+# The event loop toggle is set by conftest and does not change during the
+# test session
+EVENT_LOOP_ACTIVE = base.FEATURE_EVENT_LOOP.is_active()
 
 
 def init_device(devices, name: str):
     """Initialise a device."""
-    device = devices.get_device(name)
+    device = get_device(devices, name)
 
     # Configure logging to be captured
     LOG_LIST.clear()
@@ -33,24 +39,57 @@ def init_device(devices, name: str):
     return device
 
 
+@functools.lru_cache(maxsize=None)
+def get_config_db_client():
+    """Get a config DB client shared by all the tests."""
+    return base_config.new_config_db_client()
+
+
+@functools.lru_cache(maxsize=None)
+def get_device(devices, name: str):
+    """Get a device proxy, reusing it for the rest of the test session."""
+    device = devices.get_device(name)
+    # The commands do not change, so only query them once
+    device.command_configs = {
+        config.cmd_name: config for config in device.command_list_query()
+    }
+    device.command_names = frozenset(device.command_configs)
+    return device
+
+
 def update_attributes(device):
     """Update attribute if event loop is not running."""
-    if not base.FEATURE_EVENT_LOOP.is_active():
+    if not EVENT_LOOP_ACTIVE:
         device.update_attributes()
 
 
+def has_txn_in_tail(last: int = 5) -> bool:
+    """Check if any of the last log messages has a transaction ID tag."""
+    return LOG_LIST.text_in_tag("txn-", last=last)
+
+
 def wait_for(
     predicate: Callable, timeout: float = TIMEOUT, sleep: float = SLEEP
-) -> None:
-    """Wait for predicate to be true."""
-    elapsed = 0.0
-    while not predicate() and elapsed < timeout:
-        time.sleep(sleep)
-        elapsed += sleep
-    if elapsed >= timeout:
-        LOG.warning("Timeout occurred while waiting")
+) -> bool:
+    """Wait for predicate to be true.
 
+    The polling interval starts short and backs off to the sleep time, so
+    conditions that are met quickly do not wait for a whole interval.
 
-def wait_for_state(device, state):
+    :returns: whether the predicate became true before the timeout
+    """
+    elapsed = 0.0
+    interval = min(MIN_SLEEP, sleep)
+    while not predicate():
+        if elapsed >= timeout:
+            LOG.warning("Timeout occurred while waiting")
+            return False
+        time.sleep(interval)
+        elapsed += interval
+        interval = min(2 * interval, sleep)
+    return True
+
+
+def wait_for_state(device, state) -> bool:
     """Wait for device state to reach the required value."""
-    wait_for(lambda: device.state() == state)
+    return wait_for(lambda: device.state() == state)
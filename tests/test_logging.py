@@ -1,3 +1,6 @@
+import collections
+import inspect
+import itertools
 import logging
 import sys
 
@@ -10,28 +13,33 @@ MSG = "Running tango test"
 
 
 class ListHandler(logging.Handler):
-    """A class for list handler."""
+    """A class for list handler.
 
-    def __init__(self):
+    Only the most recent records are kept, and they are formatted when read.
+    """
+
+    def __init__(self, maxlen: int = 4096):
         super().__init__()
-        self.list = []
+        self.list = collections.deque(maxlen=maxlen)
 
     def clear(self) -> None:
         self.list.clear()
 
     def emit(self, record: logging.LogRecord) -> None:
-        msg = self.format(record)
-        self.list.append(msg)
+        self.list.append(record)
 
     def get_line(self, pos: int):
-        return self.list[pos] if self.list else "||||||"
+        return self.format(self.list[pos]) if self.list else "||||||"
 
     def get_tag_from(self, pos: int) -> str:
         return self.get_tag_from_line(self.get_line(pos))
 
     @staticmethod
     def get_tag_from_line(line: str) -> str:
-        return line.split("|")[6]
+        # The tag is the seventh field, so the message after it need not be
+        # split
+        fields = line.split("|", 7)
+        return fields[6] if len(fields) > 6 else ""
 
     def get_last(self) -> str:
         return self.get_line(-1)
@@ -40,21 +48,21 @@ class ListHandler(logging.Handler):
         return self.get_tag_from(-1)
 
     def text_in_tag(self, text: str, last: int = 1) -> bool:
-        sub_list = self.list[-last:]
-        is_text_in = False
-        for item in sub_list:
-            if text in self.get_tag_from_line(item):
-                is_text_in = True
-                break
-        return is_text_in
+        # The tag field of a formatted line comes from the tags set on the
+        # record when it was filtered, so check those without formatting.
+        sub_list = itertools.islice(reversed(self.list), last)
+        return any(text in getattr(record, "tags", "") for record in sub_list)
 
     def __iter__(self) -> Iterable[str]:
-        return self.list.__iter__()
+        return (self.format(record) for record in self.list)
 
 
 class FakeDevice:
     """Class for Fake Device."""
 
+    def __init__(self):
+        self._logger = tl.get_logger()
+
     def info_stream(self, _: str, *args) -> None:
         print("info stream should not be called")
 
@@ -62,7 +70,13 @@ class FakeDevice:
         return "fake"
 
     def get_logger(self) -> logging.Logger:
-        return tl.get_logger()
+        return self._logger
+
+
+class StreamDevice:
+    """Class for device with its info stream redirected to Python logging."""
+
+    info_stream = tl.TangoFilter.log_man.make_fn(logging.INFO)
 
 
 def test_stuff():
@@ -82,3 +96,26 @@ def test_stuff():
     assert log is dev.get_logger()
     log.info(MSG)
     dev.info_stream(MSG)
+
+
+def test_stream_caller():
+    handler = ListHandler()
+    handler.addFilter(tl.TangoFilter())
+    root = logging.getLogger()
+    level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        dev = StreamDevice()
+        lineno = inspect.currentframe().f_lineno + 1
+        dev.info_stream(MSG)
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+
+    # The record should be attributed to the caller of the stream
+    record = handler.list[-1]
+    assert record.getMessage() == MSG
+    assert record.filename == "test_logging.py"
+    assert record.funcName == "test_stream_caller"
+    assert record.lineno == lineno
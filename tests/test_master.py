@@ -4,12 +4,19 @@ import tango
 
 from pytest_bdd import given, parsers, scenarios, then, when
 
-from ska_sdp_lmc import HealthState, base_config, tango_logging
-from .device_utils import init_device, update_attributes, wait_for_state, LOG_LIST
+from ska_sdp_lmc import HealthState, tango_logging
+from .device_utils import (
+    get_config_db_client,
+    has_txn_in_tail,
+    init_device,
+    update_attributes,
+    wait_for_state,
+)
 
 DEVICE_NAME = "test_sdp/elt/master"
-CONFIG_DB_CLIENT = base_config.new_config_db_client()
 LOG = tango_logging.get_logger()
+# Device states by name
+DEV_STATES = dict(tango.DevState.names)
 
 # -------------------------------
 # Get scenarios from feature file
@@ -50,10 +57,11 @@ def set_device_state(master_device, initial_state):
     update_attributes(master_device)
 
     # Wait for the device state to update
-    wait_for_state(master_device, tango.DevState.names[initial_state])
+    state = DEV_STATES[initial_state]
+    wait_for_state(master_device, state)
 
     # Check that state has been set correctly
-    assert master_device.state() == tango.DevState.names[initial_state]
+    assert master_device.state() == state
 
 
 # ----------
@@ -85,7 +93,7 @@ def call_command(master_device, command):
 
     """
     # Check command is present
-    assert command in master_device.get_command_list()
+    assert command in master_device.command_names
 
     # Call the command and remember any exception
     try:
@@ -109,7 +117,7 @@ def device_state_is(master_device, final_state):
     :param final_state: expected state value
 
     """
-    assert master_device.state() == tango.DevState.names[final_state]
+    assert master_device.state() == DEV_STATES[final_state]
 
 
 @then(parsers.parse("the state should become {final_state:S}"))
@@ -122,10 +130,11 @@ def device_state_becomes(master_device, final_state):
     :param final_state: expected state value
 
     """
+    state = DEV_STATES[final_state]
     LOG.debug("Waiting for device state %s", final_state)
-    wait_for_state(master_device, tango.DevState.names[final_state])
+    wait_for_state(master_device, state)
     LOG.debug("Reached device state %s", master_device.state())
-    assert master_device.state() == tango.DevState.names[final_state]
+    assert master_device.state() == state
 
 
 @then(parsers.parse("healthState should be {health_state:S}"))
@@ -155,14 +164,14 @@ def device_raised_dev_failed_exception(master_device):
 @then("the log should not contain a transaction ID")
 def log_contains_no_transaction_id():
     """Check that the log does not contain a transaction ID."""
-    assert not LOG_LIST.text_in_tag("txn-", last=5)
+    assert not has_txn_in_tail()
 
 
 @then("the log should contain a transaction ID")
 def log_contains_transaction_id():
     """Check that the log contains a transaction ID."""
     # Allow some scope for some additional messages afterwards.
-    assert LOG_LIST.text_in_tag("txn-", last=5)
+    assert has_txn_in_tail()
 
 
 # -----------------------------------------------------------------------------
@@ -172,7 +181,7 @@ def log_contains_transaction_id():
 
 def wipe_config_db():
     """Remove the master entry in the config DB."""
-    CONFIG_DB_CLIENT.backend.delete("/master", recursive=True, must_exist=False)
+    get_config_db_client().backend.delete("/master", must_exist=False)
 
 
 def set_state(state):
@@ -183,9 +192,9 @@ def set_state(state):
 
     """
     # Check state is a valid value
-    assert state in tango.DevState.names
+    assert state in DEV_STATES
 
     master = {"transaction_id": None, "state": state}
 
-    for txn in CONFIG_DB_CLIENT.txn():
+    for txn in get_config_db_client().txn():
         txn.update_master(master)
@@ -1,31 +1,42 @@
 """SDP Subarray device tests."""
 
+import functools
 import os
 import json
 import tango
 
 from pytest_bdd import given, parsers, scenarios, then, when
 
-from ska_telmodel.schema import validate
+from ska_telmodel.schema import schema_by_uri
 from ska_telmodel.sdp.version import SDP_RECVADDRS_PREFIX
 
 import ska_sdp_config
 
-from ska_sdp_lmc import AdminMode, HealthState, ObsState, base_config, tango_logging
+from ska_sdp_lmc import AdminMode, HealthState, ObsState, tango_logging
 from .device_utils import (
+    get_config_db_client,
+    has_txn_in_tail,
     init_device,
     update_attributes,
     wait_for,
     wait_for_state,
-    LOG_LIST,
 )
 
+# Use orjson to decode JSON if it is available, as the device does. It is in
+# the test requirements, so the fallback is only for local runs without it.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 DEVICE_NAME = "test_sdp/elt/subarray_1"
 SUBARRAY_ID = "01"
 SCHEMA_VERSION = "0.3"
-RECEIVE_WORKFLOWS = ["test_receive_addresses"]
-CONFIG_DB_CLIENT = base_config.new_config_db_client()
+RECVADDRS_SCHEMA = SDP_RECVADDRS_PREFIX + SCHEMA_VERSION
+RECEIVE_WORKFLOWS = frozenset({"test_receive_addresses"})
 LOG = tango_logging.get_logger()
+# Device states by name
+DEV_STATES = dict(tango.DevState.names)
 
 # -------------------------------
 # Get scenarios from feature file
@@ -68,15 +79,13 @@ def set_device_state(subarray_device, state: str):
     # Update the attributes if the event loop is not running
     update_attributes(subarray_device)
 
-    # Wait for the device state to update
+    # Wait for the device state to update, which checks that state has been
+    # set correctly
     LOG.debug("Waiting for device state %s", state)
-    wait_for_state_and_obs_state(
-        subarray_device, tango.DevState.names[state], ObsState.EMPTY
+    assert wait_for_state_and_obs_state(
+        subarray_device, DEV_STATES[state], ObsState.EMPTY
     )
-    LOG.debug("Reached device state %s", subarray_device.state().name)
-
-    # Check that state has been set correctly
-    assert subarray_device.state() == tango.DevState.names[state]
+    LOG.debug("Reached device state %s", state)
 
 
 @given(parsers.parse("obsState is {initial_obs_state:S}"))
@@ -97,15 +106,13 @@ def set_obs_state(subarray_device, initial_obs_state: str):
     # Update the attributes if the event loop is not running
     update_attributes(subarray_device)
 
-    # Wait for the device obsState to update
+    # Wait for the device obsState to update, which checks that obsState has
+    # been set correctly
     LOG.debug("Waiting for obsState %s", initial_obs_state)
-    wait_for_state_and_obs_state(
+    assert wait_for_state_and_obs_state(
         subarray_device, tango.DevState.ON, ObsState[initial_obs_state]
     )
-    LOG.debug("Reached obsState %s", subarray_device.obsState.name)
-
-    # Check obsState has been set correctly
-    assert subarray_device.ObsState == ObsState[initial_obs_state]
+    LOG.debug("Reached obsState %s", initial_obs_state)
 
 
 # -----------------------------------------------------------------------------
@@ -137,11 +144,9 @@ def call_command(subarray_device, command):
     :param command: the name of the command
 
     """
-    # Check command is present
-    assert command in subarray_device.get_command_list()
-
-    # Get information about the command
-    command_config = subarray_device.get_command_config(command)
+    # Get information about the command. Its presence is checked when it is
+    # invoked.
+    command_config = subarray_device.command_configs[command]
 
     # Get the command argument
     if command_config.in_type == tango.DevVoid:
@@ -152,11 +157,7 @@ def call_command(subarray_device, command):
         message = "Cannot handle command with argument type {}"
         raise ValueError(message.format(command_config.in_type))
 
-    # Call the command
-    try:
-        subarray_device.command_inout(command, cmd_param=config_str)
-    except tango.DevFailed as e:
-        subarray_device.exception = e
+    invoke_command(subarray_device, command, config_str)
 
 
 @when("I call <command> without an interface value in the JSON configuration")
@@ -169,20 +170,13 @@ def call_command_without_interface(subarray_device, command):
     :param command: the name of the command
 
     """
-    # Check command is present
-    assert command in subarray_device.get_command_list()
-
     # Get previous version of the command argument and delete the interface
     # value
     config = get_command_argument(command, version="previous", decode=True)
     del config["interface"]
     config_str = json.dumps(config)
 
-    # Call the command
-    try:
-        subarray_device.command_inout(command, cmd_param=config_str)
-    except tango.DevFailed as e:
-        subarray_device.exception = e
+    invoke_command(subarray_device, command, config_str)
 
 
 @when("I call <command> with previous JSON configuration")
@@ -194,17 +188,10 @@ def call_command_with_previous_config(subarray_device, command):
     :param command: the name of the command
 
     """
-    # Check command is present
-    assert command in subarray_device.get_command_list()
-
     # Get previous version of the command argument
     config_str = get_command_argument(command, version="previous")
 
-    # Call the command
-    try:
-        subarray_device.command_inout(command, cmd_param=config_str)
-    except tango.DevFailed as e:
-        subarray_device.exception = e
+    invoke_command(subarray_device, command, config_str)
 
 
 @when("I call <command> with an invalid JSON configuration")
@@ -216,17 +203,10 @@ def call_command_with_invalid_json(subarray_device, command):
     :param command: the name of the command
 
     """
-    # Check command is present
-    assert command in subarray_device.get_command_list()
-
     # Read an invalid command argument
     config_str = get_command_argument(command, version="invalid")
 
-    # Call the command
-    try:
-        subarray_device.command_inout(command, cmd_param=config_str)
-    except tango.DevFailed as e:
-        subarray_device.exception = e
+    invoke_command(subarray_device, command, config_str)
 
 
 @when("the receive processing block writes the receive addresses into its state")
@@ -239,14 +219,16 @@ def write_receive_addresses(subarray_device):
     """
     receive_addresses = get_receive_addresses()
 
-    for txn in CONFIG_DB_CLIENT.txn():
-        pb_list = txn.list_processing_blocks()
-        for pb_id in pb_list:
-            pb = txn.get_processing_block(pb_id)
-            if pb.workflow["id"] in RECEIVE_WORKFLOWS:
-                pb_state = txn.get_processing_block_state(pb_id)
-                pb_state["receive_addresses"] = receive_addresses
-                txn.update_processing_block_state(pb_id, pb_state)
+    # The PBs were created from the AssignResources argument, so the receive
+    # workflow PBs are known without reading them from the config DB
+    _, pbs = get_sbi_pbs()
+    pb_ids = [pb.id for pb in pbs if pb.workflow["id"] in RECEIVE_WORKFLOWS]
+
+    for txn in get_config_db_client().txn():
+        for pb_id in pb_ids:
+            pb_state = txn.get_processing_block_state(pb_id)
+            pb_state["receive_addresses"] = receive_addresses
+            txn.update_processing_block_state(pb_id, pb_state)
 
     # Update attributes if event loop is not running
     update_attributes(subarray_device)
@@ -266,7 +248,7 @@ def device_state_is(subarray_device, expected):
     :param expected: the expected device state.
 
     """
-    assert subarray_device.state() == tango.DevState.names[expected]
+    assert subarray_device.state() == DEV_STATES[expected]
 
 
 @then(parsers.parse("the state should become {expected:S}"))
@@ -278,10 +260,11 @@ def device_state_becomes(subarray_device, expected):
     :param expected: the expected device state.
 
     """
+    state = DEV_STATES[expected]
     LOG.debug("Waiting for device state %s", expected)
-    wait_for_state(subarray_device, tango.DevState.names[expected])
+    wait_for_state(subarray_device, state)
     LOG.debug("Reached device state %s", subarray_device.state())
-    assert subarray_device.state() == tango.DevState.names[expected]
+    assert subarray_device.state() == state
 
 
 @then(parsers.parse("obsState should be {final_obs_state:S}"))
@@ -306,10 +289,11 @@ def obs_state_becomes(subarray_device, final_obs_state):
     :param final_obs_state: the expected obsState.
 
     """
+    obs_state = ObsState[final_obs_state]
     LOG.debug("Waiting for obsState %s", final_obs_state)
-    wait_for_obs_state(subarray_device, ObsState[final_obs_state])
+    wait_for_obs_state(subarray_device, obs_state)
     LOG.debug("Reached obsState %s", subarray_device.obsState)
-    assert subarray_device.obsState == ObsState[final_obs_state]
+    assert subarray_device.obsState == obs_state
 
 
 @then(parsers.parse("adminMode should be {admin_mode:S}"))
@@ -345,8 +329,8 @@ def command_input_type_is(subarray_device, command, input_type):
     :param input_type: the expected input type
 
     """
-    assert command in subarray_device.get_command_list()
-    command_config = subarray_device.get_command_config(command)
+    assert command in subarray_device.command_names
+    command_config = subarray_device.command_configs[command]
     assert command_config.in_type == getattr(tango, input_type)
 
 
@@ -360,8 +344,8 @@ def command_output_type_is(subarray_device, command, output_type):
     :param output_type: the expected output type
 
     """
-    assert command in subarray_device.get_command_list()
-    command_config = subarray_device.get_command_config(command)
+    assert command in subarray_device.command_names
+    command_config = subarray_device.command_configs[command]
     assert command_config.out_type == getattr(tango, output_type)
 
 
@@ -388,7 +372,7 @@ def processing_blocks_in_config_db():
     # Get the expected processing blocks from the AssignResources argument
     _, pbs = get_sbi_pbs()
     # Check they are present in the config DB
-    for txn in CONFIG_DB_CLIENT.txn():
+    for txn in get_config_db_client().txn():
         pb_ids = txn.list_processing_blocks()
         for pb_expected in pbs:
             assert pb_expected.id in pb_ids
@@ -404,17 +388,16 @@ def receive_addresses_expected(subarray_device):
     :param subarray_device: An SDPSubarray device.
 
     """
-    recvaddrs_schema = SDP_RECVADDRS_PREFIX + SCHEMA_VERSION
-
     # Get the expected receive addresses from the data file
     receive_addresses_expected = get_receive_addresses()
-    receive_addresses = json.loads(subarray_device.receiveAddresses)
+    receive_addresses = json_loads(subarray_device.receiveAddresses)
     assert receive_addresses == receive_addresses_expected
-    validate(recvaddrs_schema, receive_addresses, 2)
+    get_schema(RECVADDRS_SCHEMA, 2).validate(receive_addresses)
 
-    # With interface version given as part of JSON object
-    receive_addresses["interface"] = recvaddrs_schema
-    validate(None, receive_addresses, 2)
+    # With interface version given as part of JSON object. The schema for
+    # the interface is the one already built above.
+    receive_addresses["interface"] = RECVADDRS_SCHEMA
+    get_schema(receive_addresses["interface"], 2).validate(receive_addresses)
 
 
 @then("receiveAddresses should be an empty JSON object")
@@ -425,21 +408,21 @@ def receive_addresses_empty(subarray_device):
     :param subarray_device: An SDPSubarray device.
 
     """
-    receive_addresses = json.loads(subarray_device.receiveAddresses)
+    receive_addresses = json_loads(subarray_device.receiveAddresses)
     assert receive_addresses is None
 
 
 @then("the log should not contain a transaction ID")
 def log_contains_no_transaction_id():
     """Check that the log does not contain a transaction ID."""
-    assert not LOG_LIST.text_in_tag("txn-", last=10)
+    assert not has_txn_in_tail(last=10)
 
 
 @then("the log should contain a transaction ID")
 def log_contains_transaction_id():
     """Check that the log does contain a transaction ID."""
     # Allow some scope for some additional messages afterwards.
-    assert LOG_LIST.text_in_tag("txn-", last=10)
+    assert has_txn_in_tail(last=10)
 
 
 # -----------------------------------------------------------------------------
@@ -447,6 +430,18 @@ def log_contains_transaction_id():
 # -----------------------------------------------------------------------------
 
 
+@functools.lru_cache(maxsize=None)
+def get_schema(uri, strictness):
+    """
+    Get a schema from the telescope model, building it only once.
+
+    :param uri: interface URI of the schema
+    :param strictness: strictness of the schema
+
+    """
+    return schema_by_uri(uri, strictness)
+
+
 def wait_for_state_and_obs_state(device, state, obs_state):
     """
     Wait for device state and obsState to reach the required values.
@@ -454,9 +449,17 @@ def wait_for_state_and_obs_state(device, state, obs_state):
     :param device: tango device
     :param state: required state value
     :param obs_state: required obsState value
+    :returns: whether the values were reached
 
     """
-    wait_for(lambda: device.state() == state and device.obsState == obs_state)
+    expected = [state, obs_state]
+
+    def reached():
+        # Read both attributes in one call
+        attrs = device.read_attributes(["State", "obsState"])
+        return [attr.value for attr in attrs] == expected
+
+    return wait_for(reached)
 
 
 def wait_for_obs_state(device, obs_state):
@@ -465,16 +468,18 @@ def wait_for_obs_state(device, obs_state):
 
     :param device: tango device
     :param obs_state: required obsState value
+    :returns: whether the value was reached
 
     """
-    wait_for(lambda: device.obsState == obs_state)
+    return wait_for(lambda: device.obsState == obs_state)
 
 
 def wipe_config_db():
     """Remove the subarray, SBI and PB entries in the config DB."""
-    CONFIG_DB_CLIENT.backend.delete("/subarray", recursive=True, must_exist=False)
-    CONFIG_DB_CLIENT.backend.delete("/sb", recursive=True, must_exist=False)
-    CONFIG_DB_CLIENT.backend.delete("/pb", recursive=True, must_exist=False)
+    for txn in get_config_db_client().txn():
+        txn.raw.delete("/subarray", recursive=True, must_exist=False)
+        txn.raw.delete("/sb", recursive=True, must_exist=False)
+        txn.raw.delete("/pb", recursive=True, must_exist=False)
 
 
 def set_state_and_obs_state(state, obs_state):
@@ -486,18 +491,24 @@ def set_state_and_obs_state(state, obs_state):
 
     """
     # Check state and obsState are valid values
-    assert state in tango.DevState.names
+    assert state in DEV_STATES
     assert obs_state in ObsState.__members__
 
     sbi, pbs = get_sbi_pbs()
-    receive_addresses = get_receive_addresses()
+    # The cached SBI is shared, so only its top-level values are replaced,
+    # in a copy
+    sbi = dict(sbi)
 
+    # PB states. The receive workflows' state also has the receive addresses
+    pb_state = {"status": "RUNNING"}
     if obs_state == "RESOURCING":
         # Transitional obs_state: target is IDLE, but receive workflow has not
         # written receive addresses into PB state.
         obs_state_target = "IDLE"
+        receive_pb_state = pb_state
     else:
         obs_state_target = obs_state
+        receive_pb_state = {**pb_state, "receive_addresses": get_receive_addresses()}
 
     subarray = {
         "state": state,
@@ -518,7 +529,7 @@ def set_state_and_obs_state(state, obs_state):
 
     # Make all the changes to the configuration in a single transaction
 
-    for txn in CONFIG_DB_CLIENT.txn():
+    for txn in get_config_db_client().txn():
 
         # Update subarray entry
 
@@ -526,84 +537,113 @@ def set_state_and_obs_state(state, obs_state):
 
         # Delete old SBI and PB entries
 
-        for sbi_id in txn.list_scheduling_blocks():
-            txn.raw.delete("/sb/" + sbi_id)
-        for pb_id in txn.list_processing_blocks():
-            txn.raw.delete("/pb/" + pb_id)
-            txn.raw.delete("/pb/" + pb_id + "/state", must_exist=False)
+        txn.raw.delete("/sb", recursive=True, must_exist=False)
+        txn.raw.delete("/pb", recursive=True, must_exist=False)
 
         # Create new SBI and PB entries
 
         if obs_state != "EMPTY":
             for pb in pbs:
                 txn.create_processing_block(pb)
-                pb_state = {"status": "RUNNING"}
                 if pb.workflow["id"] in RECEIVE_WORKFLOWS:
                     sbi["pb_receive_addresses"] = pb.id
-                    if obs_state != "RESOURCING":
-                        pb_state["receive_addresses"] = receive_addresses
-                txn.create_processing_block_state(pb.id, pb_state)
+                    txn.create_processing_block_state(pb.id, receive_pb_state)
+                else:
+                    txn.create_processing_block_state(pb.id, pb_state)
             txn.create_scheduling_block(sbi.get("id"), sbi)
 
 
+@functools.lru_cache(maxsize=None)
 def get_sbi_pbs():
-    """Get SBI and PBs from AssignResources argument."""
+    """
+    Get SBI and PBs from AssignResources argument.
+
+    The result is shared between calls, so it must not be modified.
+
+    """
     config = get_command_argument("AssignResources", decode=True)
 
     # Checking if configuration string is the new version
-    eb_id = config.get("eb_id")
-    scan_types = config.get("scan_types")
-    for scan_type in scan_types:
-        scan_type["id"] = scan_type.pop("scan_type_id")
+    eb_id = config["eb_id"]
+    # Build renamed copies rather than modifying the decoded argument
+    scan_types = [
+        rename_keys(scan_type, {"scan_type_id": "id"})
+        for scan_type in config["scan_types"]
+    ]
+
+    # Temporary - config DB currently doesn't support new schema
+    pbs = [
+        ska_sdp_config.ProcessingBlock(
+            pbc["pb_id"],
+            eb_id,
+            rename_keys(pbc["workflow"], {"kind": "type", "name": "id"}),
+            parameters=pbc.get("parameters"),
+            dependencies=pbc.get("dependencies", []),
+        )
+        for pbc in config["processing_blocks"]
+    ]
+
+    # PB IDs by workflow type
+    pb_ids = {"realtime": [], "batch": []}
+    for pb in pbs:
+        pb_ids[pb.workflow["type"]].append(pb.id)
+
     sbi = {
         "id": eb_id,
         "subarray_id": SUBARRAY_ID,
         "scan_types": scan_types,
-        "pb_realtime": [],
-        "pb_batch": [],
+        "pb_realtime": pb_ids["realtime"],
+        "pb_batch": pb_ids["batch"],
         "pb_receive_addresses": None,
         "current_scan_type": None,
         "scan_id": None,
         "status": "ACTIVE",
     }
 
-    pbs = []
-    for pbc in config.get("processing_blocks"):
-        pb_id = pbc.get("pb_id")
-        wf_type = pbc.get("workflow").get("kind")
-        sbi["pb_" + wf_type].append(pb_id)
-        if "dependencies" in pbc:
-            dependencies = pbc.get("dependencies")
-        else:
-            dependencies = []
-
-        # Temporary - config DB currently doesn't support new schema
-        w = pbc.get("workflow")
-        w["type"] = w.pop("kind")
-        w["id"] = w.pop("name")
-        pb = ska_sdp_config.ProcessingBlock(
-            pb_id,
-            eb_id,
-            w,
-            parameters=pbc.get("parameters"),
-            dependencies=dependencies,
-        )
-        pbs.append(pb)
-
     return sbi, pbs
 
 
+def invoke_command(device, command, config_str):
+    """
+    Call a device command, storing any exception on the device proxy.
+
+    :param device: device proxy
+    :param command: the name of the command
+    :param config_str: command argument, or None if it has no argument
+
+    """
+    # Check command is present
+    assert command in device.command_names
+
+    try:
+        device.command_inout(command, cmd_param=config_str)
+    except tango.DevFailed as e:
+        device.exception = e
+
+
+def rename_keys(data: dict, mapping: dict) -> dict:
+    """Copy a dict, renaming some of its keys.
+
+    :param data: dict to copy
+    :param mapping: new key names, keyed by old name
+    :returns: copy with the keys renamed
+    """
+    return {mapping.get(key, key): value for key, value in data.items()}
+
+
+@functools.lru_cache(maxsize=None)
 def get_scan_type():
     """Get scan type from Configure argument."""
     config = get_command_argument("Configure", decode=True)
-    scan_type = config.get("scan_type")
+    scan_type = config["scan_type"]
     return scan_type
 
 
+@functools.lru_cache(maxsize=None)
 def get_scan_id():
     """Get scan ID from Scan argument."""
     config = get_command_argument("Scan", decode=True)
-    scan_id = config.get("scan_id")
+    scan_id = config["scan_id"]
     return scan_id
 
 
@@ -623,8 +663,14 @@ def get_command_argument(name, version=None, decode=False):
     return read_json_data(filename, decode=decode)
 
 
+@functools.lru_cache(maxsize=None)
 def get_receive_addresses():
-    """Get receive addresses from JSON file."""
+    """
+    Get receive addresses from JSON file.
+
+    The result is shared between calls, so it must not be modified.
+
+    """
     return read_json_data("receive_addresses.json", decode=True)
 
 
@@ -636,6 +682,23 @@ def read_json_data(filename, decode=False):
 
     :param decode: decode the JSON data into Python
 
+    """
+    data = read_data_file(filename)
+    if decode:
+        # Decode every time, so callers can modify the result
+        data = json_loads(data)
+    return data
+
+
+@functools.lru_cache(maxsize=None)
+def read_data_file(filename):
+    """
+    Read file from data directory, caching the contents.
+
+    If the file does not exist, it returns an empty JSON object.
+
+    :param filename: name of file
+
     """
     path = os.path.join(os.path.dirname(__file__), "data", filename)
     if os.path.exists(path):
@@ -643,6 +706,4 @@ def read_json_data(filename, decode=False):
             data = file.read()
     else:
         data = "{}"
-    if decode:
-        data = json.loads(data)
     return data
@@ -0,0 +1,32 @@
+"""Tests for subarray command validation."""
+
+import pytest
+
+from ska_telmodel.sdp.version import SDP_SCAN_PREFIX
+
+from ska_sdp_lmc import subarray_validation
+
+
+def test_orjson_decode_is_strict():
+    """Test configurations orjson cannot decode fail validation."""
+    pytest.importorskip("orjson")
+    scan_schema = SDP_SCAN_PREFIX + subarray_validation.SCHEMA_VERSION_0_3
+    for value in ["NaN", "Infinity"]:
+        config_str = f'{{"interface": "{scan_schema}", "scan_id": {value}}}'
+        version, config = subarray_validation.validate_json_config(
+            config_str,
+            SDP_SCAN_PREFIX,
+            subarray_validation.SCHEMA_VERSION_DEFAULT,
+            subarray_validation.SCHEMA_VERSION_ALLOWED,
+        )
+        assert version is None
+        assert config is None
+
+
+def test_orjson_decodes_wide_integers_as_floats():
+    """Test integers wider than 64 bits are decoded as floats by orjson."""
+    pytest.importorskip("orjson")
+    scan_id = 2**64
+    config = subarray_validation.json_loads(f'{{"scan_id": {scan_id}}}')
+    assert config["scan_id"] == float(scan_id)
+    assert isinstance(config["scan_id"], float)